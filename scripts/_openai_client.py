@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+# Shared OpenAI client setup for the generator scripts: one place for the
+# connection pool, HTTP/2 and keep-alive configuration.
+import importlib.util
+from functools import lru_cache
+from typing import Optional
+
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient, DefaultHttpxClient, OpenAI
+
+# With h2 installed, HTTP/2 multiplexes concurrent requests over a single TLS connection
+HTTP2 = importlib.util.find_spec("h2") is not None
+
+
+def _limits(max_workers: int) -> httpx.Limits:
+    # Sized for the concurrency plus retries
+    return httpx.Limits(max_connections=max(10, max_workers * 4), max_keepalive_connections=max_workers * 2)
+
+
+@lru_cache(maxsize=1)
+def get_client(max_workers: int = 1) -> OpenAI:
+    # Process-wide sync client: every caller shares one pool and its warm connections
+    return OpenAI(http_client=DefaultHttpxClient(http2=HTTP2, limits=_limits(max_workers)))
+
+
+def make_async_http_client(max_workers: int) -> httpx.AsyncClient:
+    return DefaultAsyncHttpxClient(http2=HTTP2, limits=_limits(max_workers))
+
+
+def make_async_client(max_workers: int, http_client: Optional[httpx.AsyncClient] = None) -> AsyncOpenAI:
+    # Not cached: an async connection pool belongs to the event loop that opened
+    # it, so each asyncio.run() needs its own client (one per batch). Pass
+    # http_client to share the pool with other requests, e.g. image downloads.
+    return AsyncOpenAI(http_client=http_client or make_async_http_client(max_workers))
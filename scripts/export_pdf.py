@@ -1,32 +1,38 @@
 #!/usr/bin/env python3
 import argparse
 import json
+import os
 import random
-from datetime import datetime
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from functools import lru_cache
 from pathlib import Path
-from pathlib import Path
-try:
-    from dotenv import load_dotenv
-    load_dotenv( Path(__file__).resolve().parents[1] / ".env" )
-except Exception:
-    pass
-from typing import List, Tuple
+from typing import Iterable, Iterator, List, Optional, Tuple
 
 from PIL import Image
 
+try:
+    import orjson
+except Exception:  # optional: falls back to stdlib json
+    orjson = None
+
+RESAMPLE_FILTERS = {
+    "lanczos": Image.LANCZOS,
+    "bicubic": Image.BICUBIC,
+    "bilinear": Image.BILINEAR,
+}
+
 # Auto-load .env from project root if present
 def _load_dotenv_if_present() -> None:
+    env_path = Path(__file__).resolve().parents[1] / ".env"
+    if not env_path.exists():
+        return  # skip importing python-dotenv entirely
     try:
         from dotenv import load_dotenv  # type: ignore
+        load_dotenv(env_path)
     except Exception:
-        return
-    root = Path(__file__).resolve().parents[1]
-    env_path = root / ".env"
-    if env_path.exists():
-        try:
-            load_dotenv(env_path)
-        except Exception:
-            pass
+        pass
 
 _load_dotenv_if_present()
 
@@ -56,7 +62,10 @@ def page_pixels(paper: str, dpi: int, bleed: str) -> Tuple[int, int]:
     return int(round(width_in * dpi)), int(round(height_in * dpi))
 
 
-def fit_canvas(img: Image.Image, size: Tuple[int, int]) -> Image.Image:
+def fit_canvas(img: Image.Image, size: Tuple[int, int], resample: int = Image.LANCZOS) -> Image.Image:
+    if img.size == size:
+        # Already page-sized: nothing to resize or pad
+        return img if img.mode == "L" else img.convert("L")
     target_w, target_h = size
     # Preserve aspect ratio, then paste onto white canvas
     img_ratio = img.width / img.height
@@ -67,44 +76,191 @@ def fit_canvas(img: Image.Image, size: Tuple[int, int]) -> Image.Image:
     else:
         new_h = target_h
         new_w = int(new_h * img_ratio)
-    img_resized = img.resize((new_w, new_h), Image.LANCZOS)
-    canvas = Image.new("L", (target_w, target_h), color=255)  # white background
+    img_resized = img.resize((new_w, new_h), resample)
     x = (target_w - new_w) // 2
     y = (target_h - new_h) // 2
+    # Leave the canvas uninitialised and fill only the margins white, so each
+    # page pixel is written once instead of a full white fill plus the paste
+    canvas = Image.new("L", (target_w, target_h), color=None)
     canvas.paste(img_resized, (x, y))
+    for box in (
+        (0, 0, target_w, y),  # top
+        (0, y + new_h, target_w, target_h),  # bottom
+        (0, y, x, y + new_h),  # left
+        (x + new_w, y, target_w, y + new_h),  # right
+    ):
+        if box[0] < box[2] and box[1] < box[3]:
+            canvas.paste(255, box)
     return canvas
 
 
+IMAGE_EXTS = frozenset({"png", "jpg", "jpeg", "webp", "bmp"})
+
+
+def _is_image(entry: os.DirEntry) -> bool:
+    # scandir's DirEntry caches the file type, so this needs no extra stat per file
+    return entry.is_file() and entry.name.rpartition(".")[2].lower() in IMAGE_EXTS
+
+
+def _reservoir_sample(items: Iterable[Path], k: int) -> List[Path]:
+    # Algorithm R: a uniform sample of k items in one pass, holding only k at a time
+    sample: List[Path] = []
+    for n, item in enumerate(items):
+        if n < k:
+            sample.append(item)
+        else:
+            j = random.randint(0, n)
+            if j < k:
+                sample[j] = item
+    # The reservoir's order is biased towards scan order; shuffle the picks
+    random.shuffle(sample)
+    return sample
+
+
 def select_images(folder: Path, shuffle: bool, count: int | None) -> List[Path]:
-    exts = {".png", ".jpg", ".jpeg", ".webp", ".bmp"}
-    imgs = sorted([p for p in folder.iterdir() if p.suffix.lower() in exts])
-    if shuffle:
-        random.shuffle(imgs)
+    with os.scandir(folder) as it:
+        imgs = (Path(e.path) for e in it if _is_image(e))
+        if not shuffle:
+            imgs = sorted(imgs)
+        elif count is not None and count >= 0:
+            # No sort needed when shuffling; sample straight off the directory scan
+            return _reservoir_sample(imgs, count)
+        else:
+            imgs = list(imgs)
+            random.shuffle(imgs)
     if count is not None:
         imgs = imgs[:count]
     return imgs
 
 
-def export_pdf(images: List[Path], pdf_path: Path, dpi: int, paper: str, bleed: str) -> None:
-    w, h = page_pixels(paper, dpi, bleed)
-    pages: List[Image.Image] = []
-    for p in images:
-        with Image.open(p) as im:
-            im = im.convert("L")
-            page = fit_canvas(im, (w, h))
-            pages.append(page)
-
-    if not pages:
+@lru_cache(maxsize=1)
+def _turbojpeg():
+    # Loaded on the first JPEG page only: dlopen-ing libturbojpeg costs ~50 ms,
+    # which --help, PNG-only exports and idle workers shouldn't pay
+    try:
+        from turbojpeg import TurboJPEG
+
+        return TurboJPEG()
+    except Exception:  # optional: needs PyTurboJPEG and libturbojpeg; Pillow decodes otherwise
+        return None
+
+
+def _decode_jpeg_gray(tj, src: Path, size: Tuple[int, int]) -> Image.Image:
+    from turbojpeg import TJPF_GRAY
+
+    buf = src.read_bytes()
+    width, height, _, _ = tj.decode_header(buf)
+    # Like Image.draft: the largest DCT scale-down that still covers the page
+    scale = next((s for s in (8, 4, 2) if width // s >= size[0] and height // s >= size[1]), 1)
+    arr = tj.decode(buf, pixel_format=TJPF_GRAY, scaling_factor=(1, scale))
+    return Image.fromarray(arr.reshape(arr.shape[:2]), mode="L")
+
+
+def render_page(src: Path, size: Tuple[int, int], resample: int = Image.LANCZOS) -> Image.Image:
+    tj = _turbojpeg() if src.suffix.lower() in {".jpg", ".jpeg"} else None
+    if tj is not None:
+        # libjpeg-turbo decodes straight to grayscale with SIMD and releases the GIL
+        try:
+            return fit_canvas(_decode_jpeg_gray(tj, src, size), size, resample)
+        except Exception:
+            pass  # e.g. CMYK or damaged files: let Pillow handle them
+    im = Image.open(src)
+    if im.size == size and im.mode == "L":
+        # Already a grayscale page at this paper/DPI: embed as-is; the caller closes it
+        return im
+    with im:
+        if im.size == size and im.mode == "1":
+            # process_images output (bilevel, e.g. 2550x3300 for letter @ 300 DPI):
+            # only widen to grayscale, no resampling or canvas
+            return im.convert("L")
+        # JPEG only: let libjpeg decode straight to grayscale at a reduced
+        # scale that still covers the page (no-op for other formats)
+        im.draft("L", size)
+        return fit_canvas(im.convert("L"), size, resample)
+
+
+def _render_page_bytes(src: Path, size: Tuple[int, int], resample: int) -> bytes:
+    page = render_page(src, size, resample)
+    try:
+        return page.tobytes()
+    finally:
+        page.close()
+
+
+def _render_pages(images: List[Path], size: Tuple[int, int], resample: int, workers: int) -> Iterator[Image.Image]:
+    if workers <= 1 or len(images) <= 1:
+        for p in images:
+            yield render_page(p, size, resample)
+        return
+    # Decode + resize runs in worker processes; pages come back in order as raw
+    # grayscale buffers. Only a small look-ahead window is in flight, so memory
+    # stays bounded at ~2 pages per worker plus one write batch. Shipping a page
+    # back (~8 MB at letter/300 DPI) and writing it stay serial in this process,
+    # so this only pays off when rendering (resizing raw sources) dominates.
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        pending = deque()
+        it = iter(images)
+        for p in it:
+            pending.append(ex.submit(_render_page_bytes, p, size, resample))
+            if len(pending) >= workers * 2:
+                break
+        while pending:
+            data = pending.popleft().result()
+            nxt = next(it, None)
+            if nxt is not None:
+                pending.append(ex.submit(_render_page_bytes, nxt, size, resample))
+            # frombuffer wraps the received bytes instead of copying them again
+            yield Image.frombuffer("L", size, data, "raw", "L", 0, 1)
+
+
+# Pages per PDF save call: ~16 x 8 MB decoded letter pages at 300 DPI
+PDF_BATCH_PAGES = 16
+
+
+def export_pdf(images: List[Path], pdf_path: Path, dpi: int, paper: str, bleed: str, resample: str = "lanczos", quality: int = 75, workers: int = 1) -> None:
+    if not images:
         raise ValueError("No input images to export")
 
-    first, rest = pages[0], pages[1:]
-    # resolution sets PDF DPI so physical page size matches
-    first.save(pdf_path, save_all=True, append_images=rest, resolution=dpi)
+    w, h = page_pixels(paper, dpi, bleed)
+    resample_filter = RESAMPLE_FILTERS[resample]
+    batch: List[Image.Image] = []
+    written = 0
+
+    def _flush() -> None:
+        nonlocal written
+        try:
+            # resolution sets PDF DPI so physical page size matches; Pillow embeds
+            # grayscale pages as JPEG (DCTDecode), so quality is passed to that encoder
+            batch[0].save(
+                pdf_path,
+                format="PDF",
+                save_all=True,
+                append_images=batch[1:],
+                resolution=dpi,
+                quality=quality,
+                append=written > 0,
+            )
+        finally:
+            for page in batch:
+                page.close()
+        written += len(batch)
+        batch.clear()
+
+    # Pillow's save_all holds every append_images entry in memory, while each
+    # append=True save re-parses the file and rewrites all earlier page objects
+    # (quadratic in page count). Writing PDF_BATCH_PAGES pages per save keeps
+    # memory bounded and the number of incremental updates small.
+    for page in _render_pages(images, (w, h), resample_filter, workers):
+        batch.append(page)
+        if len(batch) >= PDF_BATCH_PAGES:
+            _flush()
+    if batch:
+        _flush()
 
 
 def write_manifest(dest: Path, *, images: List[Path], pdf_path: Path, paper: str, dpi: int, bleed: str) -> Path:
     manifest = {
-        "created_at": datetime.utcnow().isoformat() + "Z",
+        "created_at": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
         "paper": paper,
         "dpi": dpi,
         "bleed": bleed,
@@ -112,21 +268,27 @@ def write_manifest(dest: Path, *, images: List[Path], pdf_path: Path, paper: str
         "output_pdf": str(pdf_path.name),
         "images": [str(p.name) for p in images],
     }
-    with dest.open("w", encoding="utf-8") as f:
-        json.dump(manifest, f, indent=2)
+    if orjson is not None:
+        dest.write_bytes(orjson.dumps(manifest, option=orjson.OPT_INDENT_2))
+    else:
+        with dest.open("w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
     return dest
 
 
-def main():
+def main(argv: Optional[List[str]] = None) -> None:
     ap = argparse.ArgumentParser(description="Combine images into a print-ready PDF for KDP")
     ap.add_argument("--input", default="output", help="folder with processed images")
     ap.add_argument("--paper", choices=["letter", "a4"], default="letter", help="page size")
     ap.add_argument("--dpi", type=int, default=300, help="PDF resolution (DPI)")
     ap.add_argument("--bleed", choices=["none", "3mm"], default="none", help="add 3mm bleed on all sides")
+    ap.add_argument("--resample", choices=sorted(RESAMPLE_FILTERS), default="lanczos", help="resize filter (bilinear/bicubic are faster, lanczos is sharpest)")
+    ap.add_argument("--quality", type=int, default=75, help="JPEG quality of embedded pages (1-95); lower is smaller and faster")
+    ap.add_argument("--workers", type=int, default=1, help="processes used to render pages (default 1, in-process); helps only when pages need resizing, e.g. raw generated images")
     ap.add_argument("--shuffle", action="store_true", help="shuffle page order")
     ap.add_argument("--count", type=int, help="limit number of pages included")
     ap.add_argument("--output", default=None, help="output PDF path (defaults to exports/book-<paper>-<timestamp>.pdf)")
-    args = ap.parse_args()
+    args = ap.parse_args(argv)
 
     project_root = Path(__file__).resolve().parents[1]
     input_dir = (project_root / args.input).resolve()
@@ -147,7 +309,7 @@ def main():
     ts = datetime.now().strftime("%Y%m%d_%H%M")
     pdf_path = Path(args.output) if args.output else exports_dir / f"book-{args.paper}-{ts}.pdf"
 
-    export_pdf(images, pdf_path, dpi=args.dpi, paper=args.paper, bleed=args.bleed)
+    export_pdf(images, pdf_path, dpi=args.dpi, paper=args.paper, bleed=args.bleed, resample=args.resample, quality=args.quality, workers=args.workers)
 
     manifest_path = logs_dir / f"export-{ts}.json"
     write_manifest(manifest_path, images=images, pdf_path=pdf_path, paper=args.paper, dpi=args.dpi, bleed=args.bleed)
@@ -1,53 +1,75 @@
 #!/usr/bin/env python3
+from __future__ import annotations
+
 import argparse
-import base64
+import asyncio
+import binascii
 import json
 import os
+import random
+import re
 import sys
 import time
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, replace
 from datetime import datetime
 from pathlib import Path
-from pathlib import Path
-try:
-    from dotenv import load_dotenv
-    load_dotenv( Path(__file__).resolve().parents[1] / ".env" )
-except Exception:
-    pass
-from typing import List, Optional, Tuple, Set
-import subprocess
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Tuple, Set
 
-try:
-    from openai import OpenAI
-except Exception as e:  # pragma: no cover
-    raise SystemExit("The 'openai' package is required. Install with: pip install -r scripts/requirements.txt") from e
+if TYPE_CHECKING:  # openai/httpx/tqdm are imported lazily so --help and arg errors return fast
+    import httpx
+    from openai import AsyncOpenAI
+
+__all__ = ["slugify", "generate_images", "run_postprocess_parallel", "main"]
 
 # Auto-load .env from project root if present
 def _load_dotenv_if_present() -> None:
+    env_path = Path(__file__).resolve().parents[1] / ".env"
+    if not env_path.exists():
+        return  # skip importing python-dotenv entirely
     try:
         from dotenv import load_dotenv  # type: ignore
+        load_dotenv(env_path)
     except Exception:
-        return
-    root = Path(__file__).resolve().parents[1]
-    env_path = root / ".env"
-    if env_path.exists():
-        try:
-            load_dotenv(env_path)
-        except Exception:
-            pass
+        pass
 
 _load_dotenv_if_present()
 
+
+def _ensure_on_path(scripts_dir: Path) -> None:
+    # Sibling scripts are imported by name. That works when this file is run
+    # directly; for in-process callers (main(argv) from a UI), add scripts/ once.
+    if str(scripts_dir) not in sys.path:
+        sys.path.append(str(scripts_dir))
+
+
+def _tqdm(*args, **kwargs):
+    try:
+        from tqdm import tqdm
+    except Exception as e:  # pragma: no cover
+        raise SystemExit("The 'tqdm' package is required. Install with: pip install -r scripts/requirements.txt") from e
+    # redraw at most twice a second; per-item refreshes contend with worker output at high concurrency
+    kwargs.setdefault("mininterval", 0.5)
+    return tqdm(*args, **kwargs)
+
+try:
+    import orjson
+except Exception:  # optional: falls back to stdlib json
+    orjson = None
+
 try:
-    from tqdm import tqdm
-except Exception as e:  # pragma: no cover
-    raise SystemExit("The 'tqdm' package is required. Install with: pip install -r scripts/requirements.txt") from e
+    from pybase64 import b64decode as _b64decode
+except Exception:  # optional: SIMD base64; stdlib binascii otherwise
+    _b64decode = binascii.a2b_base64
+
+
+# Any run of characters outside [a-z0-9] (spaces, punctuation, dashes) becomes a single "-";
+# none at either end
+_SLUG_SEPARATORS = re.compile(r"[^a-z0-9]+")
 
 
 def slugify(text: str) -> str:
-    allowed = "abcdefghijklmnopqrstuvwxyz0123456789-"
-    text = text.strip().lower().replace(" ", "-")
-    return "".join(ch if ch in allowed else "-" for ch in text)
+    return _SLUG_SEPARATORS.sub("-", text.strip().lower()).strip("-")
 
 
 def ensure_logs_dir(project_root: Path) -> Path:
@@ -63,10 +85,33 @@ def log_error(logfile: Path, message: str) -> None:
         f.write(f"[{timestamp}] {message}\n")
 
 
-def backoff_sleep(attempt: int) -> None:
+_MAX_BACKOFF = 60.0
+
+
+def _retry_after(err: Exception) -> Optional[float]:
+    # Seconds the API asked us to wait (APIStatusError carries the httpx response)
+    headers = getattr(getattr(err, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        if "retry-after-ms" in headers:
+            return float(headers["retry-after-ms"]) / 1000
+        if "retry-after" in headers:
+            return float(headers["retry-after"])
+    except ValueError:
+        pass  # HTTP-date form; fall back to exponential backoff
+    return None
+
+
+async def backoff_sleep(attempt: int, retry_after: Optional[float] = None) -> None:
     # attempt: 1..N
-    delay = 2 ** (attempt - 1)  # 1, 2, 4 ... seconds
-    time.sleep(delay)
+    if retry_after is not None and retry_after >= 0:
+        delay = min(retry_after, _MAX_BACKOFF)
+    else:
+        # Full jitter over 1, 2, 4 ... seconds so concurrent requests that hit the
+        # rate limit together do not all retry in lockstep
+        delay = random.uniform(0, min(_MAX_BACKOFF, 2 ** (attempt - 1)))
+    await asyncio.sleep(delay)
 
 
 def _is_access_error(err: Exception) -> bool:
@@ -96,45 +141,95 @@ def _dump_debug_response(logs_dir: Path, prefix: str, idx: int, resp_obj) -> Pat
                 payload = json.loads(getattr(resp_obj, "json", lambda: "{}")())
             except Exception:
                 payload = {"repr": repr(resp_obj)}
-        debug_path.write_text(json.dumps(payload, indent=2), encoding="utf-8")
+        if orjson is not None:
+            debug_path.write_bytes(orjson.dumps(payload, option=orjson.OPT_INDENT_2))
+        else:
+            debug_path.write_text(json.dumps(payload, indent=2), encoding="utf-8")
         return debug_path
     except Exception:
         # Best-effort only
         return Path("")
 
 
-def _generate_with_model(
-    client: OpenAI,
+# base64 decodes in 4-character quanta, so any multiple of 4 splits cleanly
+_B64_CHUNK = 1 << 16
+
+
+def _write_b64_image(out_path: Path, b64: str) -> None:
+    # Decode chunk by chunk straight into the file so the whole decoded image
+    # is never held in memory next to its (larger) base64 string
+    try:
+        with out_path.open("wb") as f:
+            for start in range(0, len(b64), _B64_CHUNK):
+                f.write(_b64decode(b64[start:start + _B64_CHUNK]))
+    except BaseException:
+        out_path.unlink(missing_ok=True)  # a bad payload must not leave a truncated image behind
+        raise
+
+
+async def _download_image(http: httpx.AsyncClient, url: str, out_path: Path) -> None:
+    # Stream the image straight to disk; no base64 inflation or JSON buffering
+    try:
+        async with http.stream("GET", url) as r:
+            r.raise_for_status()
+            with out_path.open("wb") as f:
+                async for chunk in r.aiter_bytes(_B64_CHUNK):
+                    f.write(chunk)
+    except BaseException:
+        out_path.unlink(missing_ok=True)  # do not leave a truncated image behind
+        raise
+
+
+@dataclass(slots=True, frozen=True)
+class GenConfig:
+    # Per-run settings shared by every generation task
+    client: AsyncOpenAI
+    http: httpx.AsyncClient  # same pool as client; used for image URL downloads
+    full_prompt: str
+    size: str
+    logfile: Path
+    run_logs_dir: Path
+    debug: bool
+    prefer_model: str = "auto"
+
+
+async def _generate_with_model(
+    cfg: GenConfig,
     model: str,
-    full_prompt: str,
-    size: str,
     out_path: Path,
-    logfile: Path,
-    run_logs_dir: Path,
     idx: int,
-    debug: bool,
     tries: int = 3,
-) -> bool:
+) -> Tuple[bool, Optional[Exception]]:
+    # Returns (ok, last_error) so callers can inspect why the retries failed
+    last_err: Optional[Exception] = None
+    # DALL-E models can return a URL: a small JSON body, with the PNG then
+    # streamed as raw bytes. Other models (gpt-image-1) always return base64.
+    response_format = "url" if model.startswith("dall-e") else "b64_json"
     for attempt in range(1, tries + 1):
         try:
-            resp = client.images.generate(
+            resp = await cfg.client.images.generate(
                 model=model,
-                prompt=full_prompt,
-                size=size,
-                response_format="b64_json",
+                prompt=cfg.full_prompt,
+                size=cfg.size,
+                response_format=response_format,
             )
 
+            url = getattr(resp.data[0], "url", None) if response_format == "url" and resp.data else None
+            if url:
+                await _download_image(cfg.http, url, out_path)
+                return True, None
+
             # Extract base64 safely
             try:
                 b64 = resp.data[0].b64_json
             except Exception as ex:
-                if debug:
-                    _dump_debug_response(run_logs_dir, f"{model}", idx, resp)
-                log_error(logfile, f"[ERROR] Exception reading b64_json for item {idx} [model={model}] => {ex}")
+                if cfg.debug:
+                    _dump_debug_response(cfg.run_logs_dir, f"{model}", idx, resp)
+                log_error(cfg.logfile, f"[ERROR] Exception reading b64_json for item {idx} [model={model}] => {ex}")
                 # log full resp and retry
                 try:
                     payload = resp.model_dump() if hasattr(resp, "model_dump") else repr(resp)
-                    log_error(logfile, f"[DEBUG] raw_response(item={idx}): {json.dumps(payload) if isinstance(payload, dict) else payload}")
+                    log_error(cfg.logfile, f"[DEBUG] raw_response(item={idx}): {json.dumps(payload) if isinstance(payload, dict) else payload}")
                 except Exception:
                     pass
                 raise
@@ -149,97 +244,156 @@ def _generate_with_model(
                 except Exception:
                     pass
                 log_error(
-                    logfile,
+                    cfg.logfile,
                     f"[ERROR] No b64_json in response for item {idx} [model={model}]; response keys: {keys}",
                 )
-                if debug:
-                    _dump_debug_response(run_logs_dir, f"{model}", idx, resp)
+                if cfg.debug:
+                    _dump_debug_response(cfg.run_logs_dir, f"{model}", idx, resp)
                 raise RuntimeError("missing b64_json")
 
-            img_bytes = base64.b64decode(b64)
-            out_path.write_bytes(img_bytes)
-            return True
+            # Decoding a multi-MB base64 payload is CPU-bound; keep it off the event loop
+            await asyncio.to_thread(_write_b64_image, out_path, b64)
+            return True, None
         except Exception as e:  # pragma: no cover (network)
-            log_error(logfile, f"generate failed ({out_path.name}) attempt {attempt} [model={model}]: {e}")
+            log_error(cfg.logfile, f"generate failed ({out_path.name}) attempt {attempt} [model={model}]: {e}")
+            last_err = e
+            if _is_access_error(e):
+                # Retrying will not grant access; let the caller decide on a fallback now
+                break
             if attempt < tries:
-                backoff_sleep(attempt)
-            else:
-                return False
+                await backoff_sleep(attempt, _retry_after(e))
+    return False, last_err
 
 
-def generate_one(
-    client: OpenAI,
-    full_prompt: str,
-    size: str,
-    out_path: Path,
-    logfile: Path,
-    run_logs_dir: Path,
-    idx: int,
-    debug: bool,
-    prefer_model: str = "auto",
-) -> Tuple[bool, str]:
+async def generate_one(cfg: GenConfig, out_path: Path, idx: int) -> Tuple[bool, str]:
+    prefer_model = cfg.prefer_model
     # Forced model path
     if prefer_model and prefer_model.lower() != "auto":
-        ok = _generate_with_model(
-            client,
-            prefer_model,
-            full_prompt,
-            size,
-            out_path,
-            logfile,
-            run_logs_dir,
-            idx,
-            debug,
-        )
+        ok, _ = await _generate_with_model(cfg, prefer_model, out_path, idx)
         return ok, prefer_model
 
     # Auto path: prefer gpt-image-1, fall back to dall-e-3 only on access errors
+    ok, err = await _generate_with_model(cfg, "gpt-image-1", out_path, idx)
+    if ok:
+        return True, "gpt-image-1"
+
+    if err is not None and _is_access_error(err):
+        log_error(cfg.logfile, f"access error for gpt-image-1 on {out_path.name}; falling back to dall-e-3: {err}")
+        ok_fb, _ = await _generate_with_model(cfg, "dall-e-3", out_path, idx)
+        return ok_fb, "dall-e-3"
+    # Non-access error: retries already attempted above
+    return False, "gpt-image-1"
+
+
+async def _warm_up(client: AsyncOpenAI, model: str) -> None:
+    # One cheap request before the batch pays the TCP/TLS handshake (and settles
+    # HTTP/2 negotiation) once, so the concurrent requests reuse that connection
+    # instead of each opening their own. Any API error still leaves it warm.
     try:
-        ok = _generate_with_model(
-            client,
-            "gpt-image-1",
-            full_prompt,
-            size,
-            out_path,
-            logfile,
-            run_logs_dir,
-            idx,
-            debug,
-        )
-        if ok:
-            return True, "gpt-image-1"
-        # If it failed after retries, do not automatically fall back unless last error suggested access issues.
-        # We didn't keep the last exception here, so only fall back when an immediate access error occurs below.
+        await client.with_options(max_retries=0).models.retrieve(model)
     except Exception:
-        # _generate_with_model swallows exceptions and returns False, so this shouldn't run.
         pass
 
-    # Single immediate probe to detect access error and trigger fallback
+
+async def _generate_batch(
+    cfg: GenConfig,
+    out_paths: List[Path],
+    sem: asyncio.Semaphore,
+    on_saved: Optional[Callable[[Path], None]] = None,
+    progress: bool = True,
+) -> List[Tuple[bool, str]]:
+    with _tqdm(total=len(out_paths), desc="Generating", unit="img", disable=not progress) as bar:
+
+        async def _bounded(i: int, out_path: Path) -> Tuple[bool, str]:
+            async with sem:
+                result = await generate_one(cfg, out_path, i)
+            bar.update(1)
+            if result[0] and on_saved is not None:
+                on_saved(out_path)
+            return result
+
+        return await asyncio.gather(*(_bounded(i, out_path) for i, out_path in enumerate(out_paths, start=1)))
+
+
+async def _generate_all(
+    full_prompt: str,
+    out_paths: List[Path],
+    size: str,
+    max_workers: int,
+    logfile: Path,
+    prefer_model: str,
+    debug: bool,
+    on_saved: Optional[Callable[[Path], None]] = None,
+) -> List[Tuple[bool, str]]:
+    _ensure_on_path(Path(__file__).resolve().parent)
     try:
-        resp = client.images.generate(model="gpt-image-1", prompt=full_prompt, size=size, response_format="b64_json")
-        b64 = getattr(resp.data[0], "b64_json", None)
-        if b64:
-            out_path.write_bytes(base64.b64decode(b64))
-            return True, "gpt-image-1"
+        from _openai_client import make_async_client, make_async_http_client
+    except Exception as e:  # pragma: no cover
+        raise SystemExit("The 'openai' package is required. Install with: pip install -r scripts/requirements.txt") from e
+
+    # One event loop multiplexes all in-flight requests; the semaphore caps
+    # concurrency the way the thread pool's max_workers used to.
+    sem = asyncio.Semaphore(max_workers)
+    http = make_async_http_client(max_workers)
+    async with make_async_client(max_workers, http) as client:  # modern SDK default env loading
+        cfg = GenConfig(
+            client=client,
+            http=http,
+            full_prompt=full_prompt,
+            size=size,
+            logfile=logfile,
+            run_logs_dir=logfile.parent,
+            debug=debug,
+            prefer_model=prefer_model,
+        )
+        if len(out_paths) > 1:
+            await _warm_up(client, prefer_model if prefer_model.lower() != "auto" else "gpt-image-1")
+        return await _generate_batch(cfg, out_paths, sem, on_saved)
+
+
+_STYLE_PROMPT = (
+    "Black-and-white line art coloring page. Clean, thick outlines, no shading, no gray. "
+    "High contrast, white background, centered subject, kid-friendly, printable. "
+)
+
+
+def _out_stem(out_name: str) -> str:
+    # A bare file name, with or without ".png"; anything with a directory part
+    # would be written outside input/
+    if Path(out_name).name != out_name or out_name in {".", ".."}:
+        raise ValueError(f"out_name must be a plain file name, got {out_name!r}")
+    stem = out_name[:-4] if out_name.lower().endswith(".png") else out_name
+    if not stem:
+        raise ValueError(f"out_name must be a plain file name, got {out_name!r}")
+    return stem
+
+
+def _out_paths(prompt: str, count: int, input_dir: Path, out_name: Optional[str]) -> List[Path]:
+    if out_name:
+        out_name = _out_stem(out_name)
+    if out_name and count == 1:
+        # Caller-chosen file name, so it knows the output path without rescanning input/
+        return [input_dir / f"{out_name}.png"]
+    slug = out_name or slugify(prompt) or "page"
+    return [input_dir / f"{slug}-{i:02d}.png" for i in range(1, count + 1)]
+
+
+def _split_results(out_paths: List[Path], results: List[Tuple[bool, str]]) -> Tuple[List[Path], List[str], Set[str]]:
+    saved: List[Path] = []
+    failed: List[str] = []
+    models_used: Set[str] = set()
+    for out_path, (ok, used_model) in zip(out_paths, results):
+        models_used.add(used_model)
+        if ok:
+            saved.append(out_path)
         else:
-            raise RuntimeError("missing b64_json")
-    except Exception as first_err:  # pragma: no cover
-        if _is_access_error(first_err):
-            log_error(logfile, f"access error for gpt-image-1 on {out_path.name}; falling back to dall-e-3: {first_err}")
-            ok_fb = _generate_with_model(
-                client,
-                "dall-e-3",
-                full_prompt,
-                size,
-                out_path,
-                logfile,
-                run_logs_dir,
-                idx,
-                debug,
-            )
-            return ok_fb, "dall-e-3" if ok_fb else "dall-e-3"
-        # Non-access error: honor original behavior (retries already attempted above)
-        return False, "gpt-image-1"
+            failed.append(out_path.name)
+    return saved, failed, models_used
+
+
+def _require_api_key() -> None:
+    if not os.getenv("OPENAI_API_KEY"):
+        raise SystemExit("Missing OPENAI_API_KEY. Set it in your environment before running.")
 
 
 def generate_images(
@@ -251,93 +405,210 @@ def generate_images(
     logfile: Path,
     prefer_model: str = "auto",
     debug: bool = False,
+    on_saved: Optional[Callable[[Path], None]] = None,
+    out_name: Optional[str] = None,
 ) -> Tuple[List[Path], List[str], Set[str]]:
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        raise SystemExit("Missing OPENAI_API_KEY. Set it in your environment before running.")
-
-    # Use modern SDK default env loading
-    client = OpenAI()
+    _require_api_key()
     input_dir.mkdir(parents=True, exist_ok=True)
 
-    saved: List[Path] = []
-    failed: List[str] = []
-    models_used: Set[str] = set()
-    style_prompt = (
-        "Black-and-white line art coloring page. Clean, thick outlines, no shading, no gray. "
-        "High contrast, white background, centered subject, kid-friendly, printable. "
-    )
-    full_prompt = f"{style_prompt}{prompt}"
-    slug = slugify(prompt) or "page"
-
-    tasks = []
-    with ThreadPoolExecutor(max_workers=max_workers) as pool:
-        for i in range(1, count + 1):
-            out_path = input_dir / f"{slug}-{i:02d}.png"
-            fut = pool.submit(
-                generate_one,
-                client,
-                full_prompt,
-                size,
-                out_path,
-                logfile,
-                logfile.parent,
-                i,
-                debug,
-                prefer_model,
-            )
-            tasks.append((i, out_path, fut))
+    if max_workers < 1:
+        # asyncio.Semaphore(0) would block every request forever
+        raise ValueError(f"max_workers must be at least 1, got {max_workers}")
+    out_paths = _out_paths(prompt, count, input_dir, out_name)
+    results = asyncio.run(_generate_all(_STYLE_PROMPT + prompt, out_paths, size, max_workers, logfile, prefer_model, debug, on_saved))
+    return _split_results(out_paths, results)
 
-        for i, out_path, fut in tqdm(tasks, desc="Generating", unit="img"):
-            ok, used_model = fut.result()
-            models_used.add(used_model)
-            if ok:
-                saved.append(out_path)
-            else:
-                failed.append(out_path.name)
 
-    return saved, failed, models_used
+def _positive_int(value: str) -> int:
+    try:
+        n = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected a positive integer, got {value!r}")
+    if n < 1:
+        raise argparse.ArgumentTypeError(f"expected a positive integer, got {n}")
+    return n
 
 
-def run_postprocess_parallel(project_root: Path, files: List[Path], output_dir: Path, resize: str, thicken: int, threshold: int, dpi: int, trim_margins: bool, max_workers: int, logfile: Path) -> Tuple[int, List[str]]:
-    sys.path.append(str(project_root / "scripts"))
+def _out_name_arg(value: str) -> str:
+    try:
+        _out_stem(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+    return value
+
+
+def _env_concurrency(default: int = 8) -> int:
+    raw = os.getenv("OPENAI_MAX_CONCURRENCY", "").strip()
+    if not raw:
+        return default
     try:
-        import process_images as proc
+        return _positive_int(raw)
+    except argparse.ArgumentTypeError as e:
+        print(f"[warn] Ignoring OPENAI_MAX_CONCURRENCY: {e}; using {default}", file=sys.stderr)
+        return default
+
+
+def parse_size(value: str) -> Tuple[int, int]:
+    w, h = value.lower().split("x")
+    return int(w), int(h)
+
+
+def _process_one(f: Path, output_dir: Path, size: Tuple[int, int], threshold: int, thicken: int, dpi: int, trim_margins: bool) -> None:
+    # Runs in a worker process; module-level so it can be pickled
+    import process_images as proc
+
+    proc.process_file(f, output_dir, size, threshold, thicken, dpi=dpi, trim_margins=trim_margins)
+
+
+def _load_process_images(project_root: Path, logfile: Path) -> Optional[str]:
+    # Returns an error marker if process_images cannot be imported
+    _ensure_on_path(project_root / "scripts")
+    try:
+        import process_images  # noqa: F401  fail fast before starting workers
     except Exception as e:
         log_error(logfile, f"failed to import process_images: {e}")
-        return 0, [f"import_error: {e}"]
+        return f"import_error: {e}"
+    return None
+
 
+def _collect_processed(futs: Dict[Future, Path], logfile: Path) -> Tuple[int, List[str]]:
     processed = 0
     failures: List[str] = []
-
-    def _wrap(f: Path) -> bool:
+    for fut in _tqdm(as_completed(futs), total=len(futs), desc="Processing", unit="img", miniters=max(1, len(futs) // 100)):
+        f = futs[fut]
         try:
-            proc.process_file(f, output_dir, parse_size(resize), threshold, thicken, dpi=dpi, trim_margins=trim_margins)
-            return True
+            fut.result()
+            processed += 1
         except Exception as e:  # pragma: no cover
             log_error(logfile, f"process failed ({f.name}): {e}")
-            return False
-
-    # local copy of parse_size to avoid circular import
-    def parse_size(value: str) -> Tuple[int, int]:
-        w, h = value.lower().split("x")
-        return int(w), int(h)
-
-    with ThreadPoolExecutor(max_workers=max_workers) as pool:
-        futs = {pool.submit(_wrap, f): f for f in files}
-        for fut in tqdm(as_completed(futs), total=len(futs), desc="Processing", unit="img"):
-            ok = fut.result()
-            if ok:
-                processed += 1
-            else:
-                failures.append(futs[fut].name)
-
+            failures.append(f.name)
     return processed, failures
 
 
-def main():
+def run_postprocess_parallel(project_root: Path, files: List[Path], output_dir: Path, resize: str, thicken: int, threshold: int, dpi: int, trim_margins: bool, max_workers: int, logfile: Path) -> Tuple[int, List[str]]:
+    import_err = _load_process_images(project_root, logfile)
+    if import_err is not None:
+        return 0, [import_err]
+
+    size = parse_size(resize)
+
+    # Processing is CPU-bound (edges, dilation, resize, PNG encode), so use
+    # processes rather than threads to run pages on separate cores.
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        futs = {
+            pool.submit(_process_one, f, output_dir, size, threshold, thicken, dpi, trim_margins): f
+            for f in files
+        }
+        return _collect_processed(futs, logfile)
+
+
+async def _serve(args: argparse.Namespace, project_root: Path, input_dir: Path, output_dir: Path, logfile: Path, out) -> None:
+    # Long-lived worker: one JSON request per stdin line, e.g.
+    #   {"id": 7, "prompt": "a fox", "out_name": "page-0007.png", "count": 1, "size": "1024x1024", "model": "auto"}
+    # and one JSON reply per request on `out` (in completion order; match on "id").
+    # The API client, its warm connections and the conversion pool persist
+    # across requests, which run concurrently under --api-concurrency.
+    _ensure_on_path(Path(__file__).resolve().parent)
+    try:
+        from _openai_client import make_async_client, make_async_http_client
+    except Exception as e:  # pragma: no cover
+        raise SystemExit("The 'openai' package is required. Install with: pip install -r scripts/requirements.txt") from e
+
+    pool: Optional[ProcessPoolExecutor] = None
+    import_err: Optional[str] = None
+    if not args.skip_process:
+        import_err = _load_process_images(project_root, logfile)
+        if import_err is None:
+            pool = ProcessPoolExecutor(max_workers=max(1, args.proc_concurrency))
+    page_size = parse_size(args.resize)
+
+    def _reply(msg: dict) -> None:
+        out.write(json.dumps(msg) + "\n")
+        out.flush()
+
+    sem = asyncio.Semaphore(args.api_concurrency)
+    http = make_async_http_client(args.api_concurrency)
+    tasks: Set[asyncio.Task] = set()
+    try:
+        async with make_async_client(args.api_concurrency, http) as client:
+            base = GenConfig(
+                client=client,
+                http=http,
+                full_prompt="",
+                size=args.size,
+                logfile=logfile,
+                run_logs_dir=logfile.parent,
+                debug=args.debug,
+                prefer_model=args.model or "auto",
+            )
+            await _warm_up(client, base.prefer_model if base.prefer_model.lower() != "auto" else "gpt-image-1")
+
+            async def _handle(req: dict) -> None:
+                try:
+                    out_name = req.get("out_name")
+                    if out_name is not None and not isinstance(out_name, str):
+                        raise ValueError(f"out_name must be a string, got {out_name!r}")
+                    # _out_paths rejects names that would land outside input/
+                    out_paths = _out_paths(req["prompt"], int(req.get("count", 1)), input_dir, out_name)
+                    cfg = replace(
+                        base,
+                        full_prompt=_STYLE_PROMPT + req["prompt"],
+                        size=req.get("size", base.size),
+                        prefer_model=req.get("model", base.prefer_model),
+                    )
+                    proc_futs: List[asyncio.Future] = []
+
+                    def _submit(path: Path) -> None:
+                        # process_file logs and swallows its errors, so success is judged by the
+                        # output existing; drop the previous run's page (same out_name) first
+                        (output_dir / f"{path.stem}_coloring.png").unlink(missing_ok=True)
+                        proc_futs.append(asyncio.wrap_future(pool.submit(_process_one, path, output_dir, page_size, args.threshold, args.thicken, args.dpi, args.trim_margins)))
+
+                    results = await _generate_batch(cfg, out_paths, sem, _submit if pool is not None else None, progress=False)
+                    saved, failed, models_used = _split_results(out_paths, results)
+                    await asyncio.gather(*proc_futs, return_exceptions=True)
+                    processed = [output_dir / f"{p.stem}_coloring.png" for p in saved] if pool is not None else []
+                    reply = {
+                        "id": req.get("id"),
+                        "ok": bool(saved) and not failed,
+                        "saved": [str(p) for p in saved],
+                        "failed": failed,
+                        "models_used": sorted(models_used),
+                        "processed": [str(p) for p in processed if p.exists()],
+                    }
+                    if import_err is not None:
+                        reply["error"] = import_err
+                    _reply(reply)
+                except Exception as e:
+                    log_error(logfile, f"serve request failed ({req.get('id')}): {e}")
+                    _reply({"id": req.get("id"), "ok": False, "error": str(e)})
+
+            while True:
+                line = await asyncio.to_thread(sys.stdin.readline)
+                if not line:
+                    break  # EOF: finish in-flight requests, then exit
+                if not line.strip():
+                    continue
+                try:
+                    req = json.loads(line)
+                    if not isinstance(req, dict) or not isinstance(req.get("prompt"), str):
+                        raise ValueError("expected a JSON object with a 'prompt' string")
+                except ValueError as e:
+                    _reply({"id": None, "ok": False, "error": f"bad request: {e}"})
+                    continue
+                task = asyncio.create_task(_handle(req))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks)
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
     ap = argparse.ArgumentParser(description="Generate line-art via OpenAI and convert to KDP-ready coloring pages")
-    ap.add_argument("--prompt", required=True, help="text prompt, e.g. 'cute forest animals'")
+    ap.add_argument("--prompt", help="text prompt, e.g. 'cute forest animals' (required unless --serve)")
     ap.add_argument("--count", type=int, default=10, help="number of images to generate")
     ap.add_argument("--size", default="1024x1024", help="generation size WxH, e.g. 1024x1024")
     ap.add_argument("--resize", default="2550x3300", help="final page size for processing (8.5x11 @300DPI)")
@@ -345,11 +616,23 @@ def main():
     ap.add_argument("--threshold", type=int, default=160, help="binarization threshold 0-255")
     ap.add_argument("--dpi", type=int, default=300, help="output DPI for saved PNGs")
     ap.add_argument("--trim-margins", action="store_true", help="auto-trim white margins before resize")
-    ap.add_argument("--max_concurrency", type=int, default=3, help="parallelism for generation/processing")
+    ap.add_argument(
+        "--api-concurrency",
+        "--max_concurrency",
+        dest="api_concurrency",
+        type=_positive_int,
+        default=_env_concurrency(),
+        help="concurrent API requests for generation (default: $OPENAI_MAX_CONCURRENCY or 8)",
+    )
+    ap.add_argument("--proc-concurrency", type=_positive_int, default=os.cpu_count() or 1, help="worker processes for conversion (default: CPU count)")
     ap.add_argument("--model", default="auto", help="force a model name (e.g. 'gpt-image-1', 'dall-e-3'); default 'auto'")
     ap.add_argument("--debug", action="store_true", help="dump raw image API responses to logs/debug-*.json for troubleshooting")
     ap.add_argument("--skip-process", action="store_true", help="only generate images, skip conversion")
-    args = ap.parse_args()
+    ap.add_argument("--serve", action="store_true", help="run as a worker: read JSON requests from stdin, write JSON replies to stdout")
+    ap.add_argument("--out-name", type=_out_name_arg, help="base file name for generated images, with or without .png (input/<name>.png for --count 1, else <name>-NN.png); default: slug of the prompt")
+    args = ap.parse_args(argv)
+    if not args.serve and not args.prompt:
+        ap.error("--prompt is required unless --serve is given")
 
     t0 = time.time()
     project_root = Path(__file__).resolve().parents[1]
@@ -360,43 +643,66 @@ def main():
 
     output_dir.mkdir(parents=True, exist_ok=True)
 
+    if args.serve:
+        _require_api_key()
+        input_dir.mkdir(parents=True, exist_ok=True)
+        # Replies get the real stdout; fd 1 is pointed at stderr so prints (ours and
+        # the conversion workers' "✔ Wrote ...") cannot interleave with the JSON
+        sys.stdout.flush()
+        replies = os.fdopen(os.dup(1), "w", encoding="utf-8", buffering=1)
+        os.dup2(2, 1)
+        try:
+            asyncio.run(_serve(args, project_root, input_dir, output_dir, logfile, replies))
+        finally:
+            sys.stdout.flush()
+            os.dup2(replies.fileno(), 1)
+            replies.close()
+        return
+
     # Model strategy log
     if args.model and args.model.lower() != "auto":
         strategy_msg = f"Using model: {args.model} (forced)"
     else:
         strategy_msg = "Using model: auto (prefer gpt-image-1, fallback to dall-e-3 on 403/access)"
-    print(strategy_msg)
+    print(strategy_msg, flush=True)
     log_error(logfile, strategy_msg)
 
-    # Generate
-    saved, gen_failed, models_used = generate_images(
-        args.prompt,
-        args.count,
-        args.size,
-        input_dir,
-        args.max_concurrency,
-        logfile,
-        prefer_model=args.model or "auto",
-        debug=args.debug,
-    )
-
     processed = 0
     proc_failed: List[str] = []
-    if not args.skip_process and saved:
-        p_count, failures = run_postprocess_parallel(
-            project_root,
-            saved,
-            output_dir,
-            args.resize,
-            args.thicken,
-            args.threshold,
-            dpi=args.dpi,
-            trim_margins=args.trim_margins,
-            max_workers=args.max_concurrency,
-            logfile=logfile,
+    proc_futs: Dict[Future, Path] = {}
+    pool: Optional[ProcessPoolExecutor] = None
+    if not args.skip_process:
+        import_err = _load_process_images(project_root, logfile)
+        if import_err is None:
+            page_size = parse_size(args.resize)
+            pool = ProcessPoolExecutor(max_workers=max(1, min(args.count, args.proc_concurrency)))
+        else:
+            proc_failed.append(import_err)
+
+    def _submit(path: Path) -> None:
+        # Convert each image as soon as it is saved, so processing overlaps the
+        # remaining API calls; pending work is just a queue of paths in the pool
+        proc_futs[pool.submit(_process_one, path, output_dir, page_size, args.threshold, args.thicken, args.dpi, args.trim_margins)] = path
+
+    try:
+        # Generate
+        saved, gen_failed, models_used = generate_images(
+            args.prompt,
+            args.count,
+            args.size,
+            input_dir,
+            args.api_concurrency,
+            logfile,
+            prefer_model=args.model or "auto",
+            debug=args.debug,
+            on_saved=_submit if pool is not None else None,
+            out_name=args.out_name,
         )
-        processed = p_count
-        proc_failed = failures
+        if pool is not None:
+            processed, proc_failed = _collect_processed(proc_futs, logfile)
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
 
     elapsed = time.time() - t0
     # Log models actually used
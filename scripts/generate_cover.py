@@ -1,27 +1,31 @@
 #!/usr/bin/env python3
 import argparse
-import base64
 import os
+import re
 import sys
+from functools import lru_cache
+from io import BytesIO
 from pathlib import Path
-from typing import Optional, Tuple
+from typing import List, Optional, Tuple
 
 from PIL import Image, ImageDraw, ImageFont
 
+try:
+    from pybase64 import b64decode
+except Exception:  # optional: SIMD base64 decoder
+    from base64 import b64decode
+
 
 # Auto-load .env from project root if present
 def _load_dotenv_if_present() -> None:
+    env_path = Path(__file__).resolve().parents[1] / ".env"
+    if not env_path.exists():
+        return  # skip importing python-dotenv entirely
     try:
         from dotenv import load_dotenv  # type: ignore
+        load_dotenv(env_path)
     except Exception:
-        return
-    root = Path(__file__).resolve().parents[1]
-    env_path = root / ".env"
-    if env_path.exists():
-        try:
-            load_dotenv(env_path)
-        except Exception:
-            pass
+        pass
 
 
 _load_dotenv_if_present()
@@ -37,16 +41,20 @@ SUPPORTED_SIZES = [
 ]
 
 
+# Any run of characters outside [a-z0-9] (spaces, punctuation, dashes) becomes a single "-";
+# none at either end
+_SLUG_SEPARATORS = re.compile(r"[^a-z0-9]+")
+
+
 def slugify(text: str) -> str:
-    allowed = "abcdefghijklmnopqrstuvwxyz0123456789-"
-    text = text.strip().lower().replace(" ", "-")
-    return "".join(ch if ch in allowed else "-" for ch in text)
+    return _SLUG_SEPARATORS.sub("-", text.strip().lower()).strip("-")
 
 
 def ensure_dir(path: Path) -> None:
     path.mkdir(parents=True, exist_ok=True)
 
 
+@lru_cache(maxsize=1)
 def find_font() -> Optional[str]:
     candidates = [
         # Common cross-platform font fallbacks
@@ -63,6 +71,8 @@ def find_font() -> Optional[str]:
     return None
 
 
+# Title fitting asks for many sizes; keep each parsed face instead of re-reading the TTF
+@lru_cache(maxsize=64)
 def load_font(size: int) -> ImageFont.FreeTypeFont | ImageFont.ImageFont:
     path = find_font()
     try:
@@ -110,8 +120,6 @@ def compose_cover(
     canvas = Image.new("RGB", TARGET_SIZE, color=canvas_bg)
 
     if bg_img is not None:
-        # Ensure size and mode
-        bg_img = bg_img.convert("RGB")
         img_ratio = bg_img.width / bg_img.height
         target_ratio = target_w / target_h
         if img_ratio > target_ratio:
@@ -120,19 +128,24 @@ def compose_cover(
         else:
             new_h = target_h
             new_w = int(new_h * img_ratio)
+        # JPEG backgrounds (--bg-image) decode at a reduced DCT scale that still
+        # covers the target; no-op for PNG/API images or already-loaded images
+        bg_img.draft("RGB", (new_w, new_h))
+        # Ensure mode
+        bg_img = bg_img.convert("RGB")
         bg_resized = bg_img.resize((new_w, new_h), Image.LANCZOS)
         x = (target_w - new_w) // 2
         y = (target_h - new_h) // 2
         canvas.paste(bg_resized, (x, y))
 
     # Overlay a subtle dark/light vignette for readability (top area)
-    overlay = Image.new("RGBA", TARGET_SIZE, (0, 0, 0, 0))
-    draw_o = ImageDraw.Draw(overlay)
+    # An "RGBA" draw on the RGB canvas blends the translucent fill over just the
+    # band, with no full-size overlay or RGB->RGBA->RGB round trip
+    draw_o = ImageDraw.Draw(canvas, "RGBA")
     if bg_mode == "light":
         draw_o.rectangle([0, 0, target_w, int(target_h * 0.35)], fill=(255, 255, 255, 90))
     else:
         draw_o.rectangle([0, 0, target_w, int(target_h * 0.35)], fill=(0, 0, 0, 110))
-    canvas = Image.alpha_composite(canvas.convert("RGBA"), overlay).convert("RGB")
 
     # Text colors
     default_fg = (20, 24, 32) if bg_mode == "light" else (245, 247, 250)
@@ -146,14 +159,17 @@ def compose_cover(
     max_width = int(TARGET_SIZE[0] * 0.88)
 
     def shrink_to_fit(text: str, size: int, min_size: int = 64) -> ImageFont.ImageFont:
-        s = size
-        while s >= min_size:
-            f = load_font(s)
-            bbox = draw.textbbox((0, 0), text, font=f)
-            if bbox[2] - bbox[0] <= max_width:
-                return f
-            s -= 6
-        return load_font(min_size)
+        # Largest size in [min_size, size] whose advance width fits; text width grows
+        # with font size, so bisect instead of stepping down one size at a time.
+        # getlength asks the (cached) face for the width alone, no bbox or ImageDraw.
+        lo, hi = min_size, size
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if load_font(mid).getlength(text) <= max_width:
+                lo = mid
+            else:
+                hi = mid - 1
+        return load_font(lo)
 
     title_font = shrink_to_fit(title, title_font_size)
     title_bbox = draw.textbbox((0, 0), title, font=title_font)
@@ -193,7 +209,7 @@ def compose_cover(
     return canvas
 
 
-def main():
+def main(argv: Optional[List[str]] = None) -> None:
     ap = argparse.ArgumentParser(description="Generate a KDP cover image with OpenAI + Pillow text overlay")
     ap.add_argument("--title", required=True, help="book title text")
     ap.add_argument("--subtitle", help="optional subtitle text")
@@ -218,7 +234,7 @@ def main():
     ap.add_argument("--bg-image", dest="bg_image", help="path to a local background image to use (no API call)")
     ap.add_argument("--bg-color", dest="bg_color", help="solid background color as #RRGGBB (overrides --bg)")
     ap.add_argument("--title-color", dest="title_color", help="title/subtitle/brand text color as #RRGGBB")
-    args = ap.parse_args()
+    args = ap.parse_args(argv)
 
     # Validate mutually exclusive background sources
     if args.bg_image and args.no_bg:
@@ -231,8 +247,11 @@ def main():
 
     client = None
     if use_ai:
+        scripts_dir = str(Path(__file__).resolve().parent)
+        if scripts_dir not in sys.path:  # imported by name; also works when main(argv) runs in-process
+            sys.path.append(scripts_dir)
         try:
-            from openai import OpenAI  # lazy import for no-AI modes
+            from _openai_client import get_client  # lazy import for no-AI modes
         except Exception as e:  # pragma: no cover
             raise SystemExit(
                 "The 'openai' package is required for AI background generation. Install with: pip install -r scripts/requirements.txt"
@@ -241,7 +260,7 @@ def main():
         api_key = os.getenv("OPENAI_API_KEY")
         if not api_key:
             raise SystemExit("Missing OPENAI_API_KEY. Set it in your environment or .env, or use --bg-image/--no-bg.")
-        client = OpenAI(api_key=api_key)
+        client = get_client()
 
     style_words = {
         "playful": "playful, friendly, vibrant composition",
@@ -278,10 +297,7 @@ def main():
                 size=args.size,  # Only request supported sizes; never 2560x1600
                 response_format="b64_json",
             )
-            b64 = resp.data[0].b64_json
-            img_bytes = base64.b64decode(b64)
-            from io import BytesIO
-            bg_img = Image.open(BytesIO(img_bytes))
+            bg_img = Image.open(BytesIO(b64decode(resp.data[0].b64_json)))
         except Exception as e:  # pragma: no cover (network)
             msg = str(e).lower()
             warn = "[warn] Background generation failed; falling back to solid canvas (--no-bg)."
@@ -319,7 +335,8 @@ def main():
     ensure_dir(out_dir)
     slug = slugify(args.title or (args.theme or "")) or "cover"
     out_path = out_dir / f"{slug}-cover.png"
-    composed.save(out_path, format="PNG", dpi=(args.dpi, args.dpi))
+    # zlib level 3: close to the default's size for photographic covers at a fraction of the encode time
+    composed.save(out_path, format="PNG", dpi=(args.dpi, args.dpi), compress_level=3)
     print(f"Saved cover: {out_path}")
 
 